@@ -14,3 +14,15 @@ INDEX_NAME = os.getenv("INDEX_NAME")
 
 ENGINE_TO_USE = os.getenv("ENGINE_TO_USE")
 FRONTEND_URL = os.getenv("FRONTEND_URL")
+
+CHANGE_FEED_BUFFER_SIZE = int(os.getenv("CHANGE_FEED_BUFFER_SIZE", 1000))
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", 100))
+CHANGE_FEED_HEARTBEAT_SECONDS = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", 15))
+
+if CHANGE_FEED_BUFFER_SIZE < 1:
+    raise ValueError("CHANGE_FEED_BUFFER_SIZE must be at least 1")
+if CHANGE_FEED_QUEUE_SIZE < 1:
+    # asyncio.Queue(maxsize=0) is unbounded, which would stop slow consumers from ever being dropped.
+    raise ValueError("CHANGE_FEED_QUEUE_SIZE must be at least 1")
+if CHANGE_FEED_HEARTBEAT_SECONDS <= 0:
+    raise ValueError("CHANGE_FEED_HEARTBEAT_SECONDS must be greater than 0")
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.change_feed import ChangeFeed
+
+
+HOST = "127.0.0.1"
+PORT = 8765
+SUBSCRIBER_COUNTS = [100, 1000, 5000, 10000]
+EVENTS_PER_RUN = 20
+CONNECT_BATCH_SIZE = 500
+EVENT_MARKER = b"event: created\n"
+
+
+def make_movie(director: str = "Director", release_date: str = "1999-01-01") -> dict:
+    return {
+        "id": str(uuid4()),
+        "title": "Load Test",
+        "director": director,
+        "release_date": release_date,
+        "synopsis": "x" * 200,
+        "rating": 4.0
+    }
+
+
+async def _take(stream, count: int) -> list:
+    frames = []
+    async for frame in stream:
+        frames.append(frame)
+        if len(frames) == count:
+            await stream.aclose()
+            break
+    return frames
+
+
+async def _settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def check_change_feed():
+    feed = ChangeFeed(buffer_size=20, queue_size=10, heartbeat_seconds=3600)
+    feed.start()
+
+    # Drop on overflow: a consumer that is never scheduled must be cut loose, not buffered.
+    stream = feed.subscribe()
+    pending = asyncio.ensure_future(stream.__anext__())
+    await _settle()
+    for _ in range(15):
+        feed.publish(event_type="created", data=make_movie())
+    await _settle()
+    try:
+        await pending
+        raise AssertionError("slow consumer was not dropped")
+    except StopAsyncIteration:
+        pass
+    assert feed.subscriber_count == 0
+
+    # Replay: resuming from the third event yields the twelve after it, in order.
+    replayed = await _take(feed.subscribe(last_event_id=f"{feed.epoch}-3"), count=12)
+    assert [frame.split(b"\n")[0] for frame in replayed] == [f"id: {feed.epoch}-{seq}".encode() for seq in range(4, 16)]
+
+    # Reset: an evicted gap, and an id from another boot, both force a refetch.
+    for _ in range(20):
+        feed.publish(event_type="created", data=make_movie())
+    await _settle()
+    for last_event_id in [f"{feed.epoch}-2", "0123456789ab-30", "3"]:
+        frames = await _take(feed.subscribe(last_event_id=last_event_id), count=1)
+        assert b"event: reset" in frames[0], last_event_id
+
+    # Filters: a director/year filter only sees matching movies, plus deletes, plus updates
+    # that move a movie out of the filter.
+    stream = feed.subscribe(director="A", release_year=2001)
+    received = asyncio.ensure_future(_take(stream, count=3))
+    await _settle()
+    matching = make_movie(director="A", release_date="2001-05-05")
+    feed.publish(event_type="created", data=make_movie(director="B", release_date="2001-05-05"))
+    feed.publish(event_type="created", data=make_movie(director="A", release_date="2002-05-05"))
+    feed.publish(event_type="created", data=matching)
+    feed.publish(event_type="updated", data={**matching, "director": "B"}, previous=matching)
+    feed.publish(event_type="updated", data=make_movie(director="B"), previous=make_movie(director="C"))
+    feed.publish(event_type="deleted", data={"id": matching["id"]})
+    frames = await asyncio.wait_for(received, timeout=5)
+    assert [frame.split(b"\n")[1] for frame in frames] == [b"event: created", b"event: updated", b"event: deleted"]
+
+    # Close ends every open stream so shutdown can drain connections.
+    stream = feed.subscribe()
+    pending = asyncio.ensure_future(stream.__anext__())
+    await _settle()
+    feed.close()
+    try:
+        await asyncio.wait_for(pending, timeout=5)
+        raise AssertionError("close did not end the stream")
+    except StopAsyncIteration:
+        pass
+
+    await feed.stop()
+    print("change feed checks passed")
+
+
+def serve():
+    import uvicorn
+    from fastapi import FastAPI
+
+    from main import stream_movie_changes
+    from utils.change_feed import change_feed
+
+    stats = {"max_stall_ms": 0.0}
+
+    async def measure_stalls():
+        # CPU time the loop spent elsewhere while this probe waited; any other request waits that long.
+        # Thread time rather than wall time, so the client process sharing the CPU isn't counted.
+        while True:
+            started = time.thread_time()
+            await asyncio.sleep(0.001)
+            stats["max_stall_ms"] = max(stats["max_stall_ms"], (time.thread_time() - started) * 1000)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        change_feed.start()
+        probe = asyncio.create_task(measure_stalls())
+        yield
+        probe.cancel()
+        await change_feed.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_api_route("/movie/changes", stream_movie_changes, methods=["GET"])
+
+    @app.post("/publish")
+    async def publish():
+        change_feed.publish(event_type="created", data=make_movie())
+        return {}
+
+    @app.get("/stats")
+    async def read_stats(reset: bool = False):
+        result = {"subscribers": change_feed.subscriber_count, "max_stall_ms": stats["max_stall_ms"]}
+        if reset:
+            stats["max_stall_ms"] = 0.0
+        return result
+
+    uvicorn.run(app, host=HOST, port=PORT, log_level="warning", timeout_graceful_shutdown=5)
+
+
+async def request(method: str, path: str) -> bytes:
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+    body = await reader.read()
+    writer.close()
+    return body.split(b"\r\n\r\n", 1)[1]
+
+
+async def get_stats(reset: bool = False) -> dict:
+    return json.loads(await request("GET", f"/stats?reset={str(reset).lower()}"))
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+
+class Client:
+    def __init__(self):
+        self.received = []
+        self.task = None
+
+    async def connect(self):
+        reader, writer = await asyncio.open_connection(HOST, PORT)
+        writer.write(f"GET /movie/changes HTTP/1.1\r\nHost: {HOST}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        await reader.readuntil(b"\r\n\r\n")
+        self.task = asyncio.create_task(self.read(reader, writer))
+
+    async def read(self, reader, writer):
+        tail = b""
+        try:
+            while chunk := await reader.read(65536):
+                data = tail + chunk
+                now = time.perf_counter()
+                self.received.extend([now] * data.count(EVENT_MARKER))
+                tail = data[-(len(EVENT_MARKER) - 1):]
+        finally:
+            writer.close()
+
+
+async def run(subscriber_count: int, server_pid: int) -> dict:
+    baseline_kib = rss_kib(server_pid)
+
+    clients = [Client() for _ in range(subscriber_count)]
+    for start in range(0, subscriber_count, CONNECT_BATCH_SIZE):
+        await asyncio.gather(*(client.connect() for client in clients[start:start + CONNECT_BATCH_SIZE]))
+    while (await get_stats())["subscribers"] < subscriber_count:
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(1)
+
+    connected_kib = rss_kib(server_pid)
+    await get_stats(reset=True)
+
+    fanout_ms = []
+    for i in range(EVENTS_PER_RUN):
+        published_at = time.perf_counter()
+        await request("POST", "/publish")
+        while any(len(client.received) <= i for client in clients):
+            await asyncio.sleep(0.001)
+        fanout_ms.append((max(client.received[i] for client in clients) - published_at) * 1000)
+    stall_ms = (await get_stats())["max_stall_ms"]
+
+    for client in clients:
+        client.task.cancel()
+    await asyncio.gather(*(client.task for client in clients), return_exceptions=True)
+    while (await get_stats())["subscribers"] > 0:
+        await asyncio.sleep(0.1)
+
+    fanout_ms.sort()
+    return {
+        "subscribers": subscriber_count,
+        "rss_mib": (connected_kib - baseline_kib) / 1024,
+        "kib_per_subscriber": (connected_kib - baseline_kib) / subscriber_count,
+        "fanout_p50_ms": fanout_ms[len(fanout_ms) // 2],
+        "fanout_max_ms": fanout_ms[-1],
+        "max_stall_ms": stall_ms
+    }
+
+
+async def load_test():
+    print(f"{'subscribers':>11} {'RSS MiB':>8} {'KiB/sub':>8} {'fan-out p50 ms':>15} "
+          f"{'fan-out max ms':>15} {'max loop stall ms':>18}")
+    for subscriber_count in SUBSCRIBER_COUNTS:
+        # A fresh server per run, since freed memory isn't returned to the OS and would skew RSS.
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve"])
+        try:
+            for _ in range(100):
+                try:
+                    await get_stats()
+                    break
+                except OSError:
+                    await asyncio.sleep(0.1)
+
+            result = await run(subscriber_count=subscriber_count, server_pid=server.pid)
+            print(f"{result['subscribers']:>11} {result['rss_mib']:>8.1f} {result['kib_per_subscriber']:>8.1f} "
+                  f"{result['fanout_p50_ms']:>15.1f} {result['fanout_max_ms']:>15.1f} {result['max_stall_ms']:>18.1f}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+async def main():
+    await check_change_feed()
+    await load_test()
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        serve()
+    else:
+        asyncio.run(main())
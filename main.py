@@ -1,19 +1,46 @@
-from fastapi import FastAPI, Request, Path, Depends, Response
+from fastapi import FastAPI, Request, Path, Depends, Response, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from typing import Optional
 from uuid import UUID
+import asyncio
+import signal
+import threading
 
 from schemas import Movie, MovieUpdate, Filters, MovieResponse, APIResponse, APIResponsePaginated
 from utils.search_clients import create_index, close_connections, insert, update, get, get_all, delete, list_directors
 from utils.pagination import Pagination
+from utils.change_feed import change_feed
 from app_vars import FRONTEND_URL
 
 
+def close_change_feed_on_exit():
+    # Uvicorn waits for open connections to drain before running lifespan shutdown, and
+    # change feed streams never finish on their own, so they are ended from the exit signal.
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        handler = signal.getsignal(sig)
+        if not callable(handler):
+            continue
+
+        def handle_exit(signum, frame, handler=handler):
+            loop.call_soon_threadsafe(change_feed.close)
+            handler(signum, frame)
+
+        signal.signal(sig, handle_exit)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await create_index()
+    change_feed.start()
+    close_change_feed_on_exit()
     yield
+    await change_feed.stop()
     await close_connections()
 
 
@@ -42,6 +69,18 @@ async def get_movies(request: Request, filters: Filters = Depends(Filters())):
     return JSONResponse(content=response.model_dump(), status_code=200)
 
 
+@app.get("/movie/changes")
+async def stream_movie_changes(request: Request,
+                               director: Optional[str] = Query(None),
+                               release_year: Optional[int] = Query(None, ge=1900, le=9999),
+                               last_event_id: Optional[str] = Header(None)):
+    stream = change_feed.subscribe(last_event_id=last_event_id, director=director, release_year=release_year)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @app.get("/movie/{movie_id}")
 async def get_movie_info(request: Request, movie_id: UUID = Path(...)):
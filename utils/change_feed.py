@@ -0,0 +1,189 @@
+import asyncio
+import json
+from collections import deque
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from app_vars import CHANGE_FEED_BUFFER_SIZE, CHANGE_FEED_QUEUE_SIZE, CHANGE_FEED_HEARTBEAT_SECONDS
+
+
+def release_year_of(data: Optional[dict]) -> Optional[int]:
+    release_date = data.get("release_date") if data else None
+    return int(str(release_date)[:4]) if release_date else None
+
+
+class ChangeEvent:
+    __slots__ = ("seq", "type", "director", "release_year", "previous_director", "previous_release_year", "frame")
+
+    def __init__(self, epoch: str, seq: int, event_type: str, data: dict, previous: Optional[dict] = None):
+        self.seq = seq
+        self.type = event_type
+        self.director = data.get("director")
+        self.release_year = release_year_of(data)
+        self.previous_director = previous.get("director") if previous else None
+        self.previous_release_year = release_year_of(previous)
+        # Encoded once here so fan-out to every subscriber is just a queue put.
+        self.frame = f"id: {epoch}-{seq}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+    def matches(self, director: Optional[str], release_year: Optional[int]) -> bool:
+        # Deletes only carry the movie id, so they go to every subscriber.
+        if self.type == "deleted":
+            return True
+        if ((director is None or self.director == director)
+                and (release_year is None or self.release_year == release_year)):
+            return True
+        # An update that moves a movie out of a subscriber's filter still has to reach it,
+        # otherwise the client keeps showing the movie under the old values.
+        return (self.type == "updated"
+                and (director is None or self.previous_director == director)
+                and (release_year is None or self.previous_release_year == release_year))
+
+
+class Subscriber:
+    __slots__ = ("queue", "director", "release_year")
+
+    def __init__(self, queue_size: int, director: Optional[str], release_year: Optional[int]):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.director = director
+        self.release_year = release_year
+
+
+class ChangeFeed:
+    HEARTBEAT_FRAME = b": keepalive\n\n"
+    DISPATCH_BATCH_SIZE = 256
+
+    def __init__(self, buffer_size: int, queue_size: int, heartbeat_seconds: float):
+        # Event ids are "<epoch>-<seq>". The epoch changes on every boot so a Last-Event-ID
+        # from a previous process can never be mistaken for one from this process.
+        self.epoch = uuid4().hex[:12]
+        self._buffer = deque(maxlen=buffer_size)
+        self._pending = deque()
+        self._subscribers = set()
+        self._last_seq = 0
+        self._dispatched_seq = 0
+        self._queue_size = queue_size
+        self._heartbeat_seconds = heartbeat_seconds
+        self._wakeup = None
+        self._tasks = []
+        self._closed = False
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def start(self):
+        if not self._tasks:
+            self._closed = False
+            self._wakeup = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._dispatch()), asyncio.create_task(self._heartbeat())]
+
+    async def stop(self):
+        self.close()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def close(self):
+        # Ends every open stream so the server can drain connections on shutdown.
+        self._closed = True
+        for subscriber in list(self._subscribers):
+            self._drop(subscriber=subscriber)
+
+    async def _heartbeat(self):
+        # One loop keeps every idle connection alive, rather than a timer per subscriber.
+        while True:
+            await asyncio.sleep(self._heartbeat_seconds)
+            for subscriber in list(self._subscribers):
+                if subscriber.queue.empty():
+                    subscriber.queue.put_nowait(self.HEARTBEAT_FRAME)
+
+    def publish(self, event_type: str, data: dict, previous: Optional[dict] = None):
+        self._last_seq += 1
+        event = ChangeEvent(epoch=self.epoch, seq=self._last_seq, event_type=event_type, data=data, previous=previous)
+        self._buffer.append(event)
+        self._pending.append(event)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch(self):
+        # Fan-out runs here rather than inside the mutating request, and yields to the loop
+        # every DISPATCH_BATCH_SIZE puts so thousands of subscribers don't stall other requests.
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            while self._pending:
+                event = self._pending.popleft()
+                self._dispatched_seq = event.seq
+                subscribers = list(self._subscribers)
+
+                for index, subscriber in enumerate(subscribers, start=1):
+                    if event.matches(director=subscriber.director, release_year=subscriber.release_year):
+                        try:
+                            subscriber.queue.put_nowait(event.frame)
+                        except asyncio.QueueFull:
+                            self._drop(subscriber=subscriber)
+                    if index % self.DISPATCH_BATCH_SIZE == 0:
+                        await asyncio.sleep(0)
+
+    def _drop(self, subscriber: Subscriber):
+        # A consumer that can't keep up is disconnected instead of buffering without bound.
+        # Its client reconnects with Last-Event-ID and catches up from the ring buffer.
+        self._subscribers.discard(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def _reset_frame(self) -> bytes:
+        return f"id: {self.epoch}-{self._dispatched_seq}\nevent: reset\ndata: {{}}\n\n".encode()
+
+    def _backlog(self, last_event_id: str, director: Optional[str], release_year: Optional[int]) -> list:
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            # The id comes from an earlier process (or is garbage); the client has to refetch.
+            return [self._reset_frame()]
+
+        last_seq = int(seq)
+        oldest_seq = self._buffer[0].seq if self._buffer else self._last_seq + 1
+        if last_seq > self._last_seq or last_seq < oldest_seq - 1:
+            # The gap has already been evicted from the ring buffer.
+            return [self._reset_frame()]
+
+        # Events past _dispatched_seq are still pending and the dispatcher will deliver them
+        # to this subscriber, so only the already-dispatched ones are replayed here.
+        return [
+            event.frame for event in self._buffer
+            if last_seq < event.seq <= self._dispatched_seq
+            and event.matches(director=director, release_year=release_year)
+        ]
+
+    async def subscribe(self, last_event_id: Optional[str] = None, director: Optional[str] = None,
+                        release_year: Optional[int] = None) -> AsyncIterator[bytes]:
+        if self._closed:
+            return
+
+        subscriber = Subscriber(queue_size=self._queue_size, director=director, release_year=release_year)
+        # Registering and snapshotting the backlog happen without yielding to the loop,
+        # so no event can fall between the replay and the live stream.
+        self._subscribers.add(subscriber)
+        backlog = self._backlog(last_event_id, director, release_year) if last_event_id is not None else []
+
+        try:
+            for frame in backlog:
+                yield frame
+
+            while True:
+                frame = await subscriber.queue.get()
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self._subscribers.discard(subscriber)
+
+
+change_feed = ChangeFeed(
+    buffer_size=CHANGE_FEED_BUFFER_SIZE,
+    queue_size=CHANGE_FEED_QUEUE_SIZE,
+    heartbeat_seconds=CHANGE_FEED_HEARTBEAT_SECONDS
+)
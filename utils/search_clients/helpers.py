@@ -5,6 +5,7 @@ from uuid import uuid4, UUID
 from .elasticsearch import ElasticsearchClient
 from .meilisearch import MeilisearchClient
 from .base import SearchClient
+from utils.change_feed import change_feed
 from schemas import Movie, MovieUpdate, Filters
 from app_vars import ENGINE_TO_USE
 
@@ -42,6 +43,7 @@ async def insert(payload: Movie) -> dict:
     })
 
     await client.insert(data=insertion_data)
+    change_feed.publish(event_type="created", data=insertion_data)
 
     return insertion_data
 
@@ -57,9 +59,12 @@ async def update(movie_id: UUID, payload: MovieUpdate) -> dict:
     update_data = payload.model_dump(exclude_unset=True)
     update_data.update({"updated_at": datetime.now().isoformat()})
 
+    previous = await get(movie_id=movie_id)
     await client.update(document_id=movie_id, data=update_data)
 
-    return await get(movie_id=movie_id)
+    data = await get(movie_id=movie_id)
+    change_feed.publish(event_type="updated", data=data, previous=previous)
+    return data
 
 
 async def get_all(filters: Filters) -> dict:
@@ -70,6 +75,7 @@ async def get_all(filters: Filters) -> dict:
 async def delete(movie_id: UUID):
     client = get_client()()
     await client.delete(document_id=movie_id)
+    change_feed.publish(event_type="deleted", data={"id": str(movie_id)})
 
 
 async def list_directors() -> list: